@@ -1,3 +1,4 @@
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -10,6 +11,9 @@ env = environ.Env(
     SECRET_KEY=(str, "django-insecure-dev-key"),
     ALLOWED_HOSTS=(list, ["*"]),
     DATABASE_URL=(str, "postgres://user:pass@db:5432/healthcare_db"),
+    DATABASE_REPLICA_URLS=(list, []),
+    CACHE_URL=(str, "locmemcache://"),
+    SCHEMA_ARTIFACT_DIR=(str, ""),
 )
 
 environ.Env.read_env(BASE_DIR / ".env")
@@ -33,6 +37,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.CompressionMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -65,6 +71,39 @@ DATABASES = {
     "default": env.db(),
 }
 
+# Optional read replicas. Reads from GET/HEAD requests are routed to them by
+# core.routers.ReplicaRouter; everything else stays on the primary.
+# Seconds to wait when connecting to a replica before falling back to the primary.
+REPLICA_CONNECT_TIMEOUT = 2
+
+REPLICA_DATABASES = []
+for index, url in enumerate(env("DATABASE_REPLICA_URLS"), start=1):
+    alias = f"replica_{index}"
+    config = env.db_url_config(url)
+    if "postgresql" in config["ENGINE"] or "mysql" in config["ENGINE"]:
+        config.setdefault("OPTIONS", {}).setdefault("connect_timeout", REPLICA_CONNECT_TIMEOUT)
+    DATABASES[alias] = {**config, "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES.append(alias)
+
+# `manage.py test` gets a separate database standing in for a replica
+# (core.tests.ReplicaRoutingTests). Nothing reads from it unless a test lists it
+# in REPLICA_DATABASES.
+if sys.argv[1:2] == ["test"] and "replica_1" not in DATABASES:
+    DATABASES["replica_1"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# Holds the read-your-writes pins for replica routing. With replicas and more
+# than one worker this must be shared, e.g. CACHE_URL=redis://redis:6379/0.
+CACHES = {
+    "default": env.cache(),
+}
+
+# How long a user keeps reading from the primary after a write.
+REPLICA_PIN_SECONDS = 5
+# How long an unreachable replica is skipped before it is tried again.
+REPLICA_RETRY_SECONDS = 30
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -88,6 +127,15 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
@@ -103,3 +151,10 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "Healthcare backend API (patients, doctors, mappings)",
     "VERSION": "1.0.0",
 }
+
+# Responses smaller than this many bytes are not worth compressing.
+COMPRESSION_MIN_SIZE = 1024
+
+# Directory holding the OpenAPI schema written by `manage.py build_schema`.
+# When unset, the schema is generated on first request and cached in memory.
+SCHEMA_ARTIFACT_DIR = env("SCHEMA_ARTIFACT_DIR")
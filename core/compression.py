@@ -0,0 +1,101 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+# Per-request compression favours speed; prebuilt artifacts use the maximum.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Content codings we can produce, in order of preference."""
+    if brotli is not None:
+        return (BROTLI, GZIP)
+    return (GZIP,)
+
+
+def compress(body, encoding, max_compression=False):
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=11 if max_compression else BROTLI_QUALITY)
+    if encoding == GZIP:
+        # mtime=0 keeps the output deterministic so artifacts are reproducible
+        return gzip.compress(body, compresslevel=9 if max_compression else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def _stream_compressor(encoding):
+    """Return ``(process, finish)`` callables for incremental compression."""
+    if encoding == BROTLI:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+        def process(chunk):
+            return compressor.process(chunk) + compressor.flush()
+
+        return process, compressor.finish
+    if encoding == GZIP:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        def process(chunk):
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        return process, compressor.flush
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def compress_sequence(chunks, encoding):
+    """Compress an iterable of byte chunks, flushing after each one."""
+    process, finish = _stream_compressor(encoding)
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_sequence(chunks, encoding):
+    process, finish = _stream_compressor(encoding)
+    async for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    """
+    Pick the best content coding from an Accept-Encoding header.
+
+    Returns None when the client only accepts the identity coding.
+    """
+    if encodings is None:
+        encodings = available_encodings()
+
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
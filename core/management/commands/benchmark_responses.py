@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.compression import available_encodings, compress
+from core.renderers import ORJSONRenderer
+
+
+def build_mappings(count):
+    """A /api/mappings/ style payload with nested patient and doctor objects."""
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+    return [
+        {
+            "id": i,
+            "patient": {
+                "id": i,
+                "name": f"Patient {i}",
+                "age": 20 + i % 60,
+                "gender": "Female" if i % 2 else "Male",
+                "contact": "+1-555-0101",
+                "address": "221B Baker Street, London",
+                "medical_history": "Type 2 diabetes, managed with metformin. Annual eye exam due.",
+                "created_at": created_at,
+                "updated_at": created_at,
+            },
+            "doctor": {
+                "id": i % 50,
+                "name": f"Dr. Doctor {i % 50}",
+                "specialization": "Cardiology",
+                "email": f"doctor{i % 50}@example.com",
+                "phone": "+1-555-0102",
+                "hospital": "City Hospital",
+                "years_of_experience": i % 30,
+                "created_at": created_at,
+                "updated_at": created_at,
+            },
+            "created_at": created_at,
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = "Report bytes on the wire and encode time for JSON list responses of increasing size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderers = {"json": JSONRenderer(), "orjson": ORJSONRenderer()}
+        encodings = available_encodings()
+
+        header = f"{'items':>7} {'renderer':>8} {'encode ms':>10} {'identity B':>11}"
+        for encoding in encodings:
+            header += f" {encoding + ' B':>10} {encoding + ' ms':>9}"
+        self.stdout.write(header)
+
+        for size in options["sizes"]:
+            data = build_mappings(size)
+            for name, renderer in renderers.items():
+                body, encode_ms = best_of(options["repeat"], renderer.render, data)
+                row = f"{size:>7} {name:>8} {encode_ms:>10.3f} {len(body):>11}"
+                for encoding in encodings:
+                    compressed, compress_ms = best_of(options["repeat"], compress, body, encoding)
+                    row += f" {len(compressed):>10} {compress_ms:>9.3f}"
+                self.stdout.write(row)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import write_schema_artifacts
+
+
+class Command(BaseCommand):
+    help = "Generate the precomputed OpenAPI schema artifacts served by /api/schema/."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            help="Directory to write artifacts to. Defaults to SCHEMA_ARTIFACT_DIR.",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["output_dir"] or settings.SCHEMA_ARTIFACT_DIR
+        if not directory:
+            raise CommandError("Set SCHEMA_ARTIFACT_DIR or pass --output-dir.")
+        for path in write_schema_artifacts(directory):
+            self.stdout.write(f"Wrote {path}")
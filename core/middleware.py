@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import routers
+from .compression import acompress_sequence, compress, compress_sequence, negotiate_encoding
+
+REPLICA_PIN_COOKIE = "db_pin_primary"
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, negotiated from Accept-Encoding.
+
+    Buffered responses smaller than ``COMPRESSION_MIN_SIZE`` bytes are sent as-is;
+    streaming responses are always compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # already encoded (e.g. the precompressed schema) or explicitly opted out
+        if response.has_header("Content-Encoding") or "no-transform" in response.get("Cache-Control", ""):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, encoding)
+            # the compressed size is unknown until the stream is consumed
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # a strong ETag would claim byte equality with the uncompressed body
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def _token_user_id(request):
+    """User id from a valid Bearer token, without touching the database."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter send reads from GET/HEAD requests to a replica.
+
+    After a write, the user behind the request's JWT (and any account the
+    request created) reads from the primary for ``REPLICA_PIN_SECONDS``, giving
+    read-your-writes. Anonymous clients get a short-lived cookie instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+
+        use_replica = request.method in ("GET", "HEAD") and REPLICA_PIN_COOKIE not in request.COOKIES
+        if use_replica:
+            user_id = _token_user_id(request)
+            use_replica = user_id is None or not routers.is_user_pinned(user_id)
+
+        token = routers.activate(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = routers.deactivate(token)
+
+        if state.wrote:
+            user_id = _token_user_id(request)
+            user_ids = {user.pk for user in state.written_users if user.pk is not None}
+            if user_id is not None:
+                user_ids.add(user_id)
+            for pinned_id in user_ids:
+                routers.pin_user(pinned_id)
+            if user_id is None:
+                response.set_cookie(
+                    REPLICA_PIN_COOKIE,
+                    "1",
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    secure=not settings.DEBUG,
+                    httponly=True,
+                    samesite="Lax",
+                )
+        return response
@@ -0,0 +1,117 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+# Per-request routing state, set by ReplicaRoutingMiddleware. Outside a request
+# (management commands, shell, tests) everything goes to the primary.
+_routing_state = ContextVar("replica_routing_state", default=None)
+
+_unavailable_until = {}
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        self.written_users = []
+
+
+def activate(use_replica):
+    """Start routing for a request; returns a token for :func:`deactivate`."""
+    return _routing_state.set(RoutingState(use_replica))
+
+
+def deactivate(token):
+    """Stop routing for a request and return its final :class:`RoutingState`."""
+    state = _routing_state.get()
+    _routing_state.reset(token)
+    return state
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_user(user_id):
+    """Keep ``user_id``'s reads on the primary for ``REPLICA_PIN_SECONDS``."""
+    cache.set(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_user_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+def _mark_unavailable(alias):
+    _unavailable_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def _replica_failure_wrapper(execute, sql, params, many, context):
+    # the failing query still errors, but later reads skip this replica
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError:
+        _mark_unavailable(context["connection"].alias)
+        raise
+
+
+def _is_available(alias):
+    if _unavailable_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        # skip this replica for a while rather than paying a connect timeout per query
+        _mark_unavailable(alias)
+        return False
+    if _replica_failure_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_replica_failure_wrapper)
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+class ReplicaRouter:
+    """
+    Sends reads from GET/HEAD requests to a read replica.
+
+    Reads stay on the primary once the request has written, inside a transaction,
+    and when no replica is reachable. Reachability is checked when the replica is
+    picked: a query that then fails on the replica raises as usual, and the
+    replica is skipped for ``REPLICA_RETRY_SECONDS`` from the next read on.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        replicas = list(settings.REPLICA_DATABASES)
+        random.shuffle(replicas)
+        for alias in replicas:
+            if _is_available(alias):
+                return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+            # e.g. registration: the new account must be readable on its next request
+            instance = hints.get("instance")
+            if isinstance(instance, get_user_model()):
+                state.written_users.append(instance)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
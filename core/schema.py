@@ -0,0 +1,171 @@
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_header_parameters
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from .compression import available_encodings, compress, negotiate_encoding
+
+SCHEMA_RENDERERS = {
+    OpenApiYamlRenderer.format: OpenApiYamlRenderer,
+    OpenApiJsonRenderer.format: OpenApiJsonRenderer,
+}
+
+ENCODING_SUFFIXES = {
+    "gzip": ".gz",
+    "br": ".br",
+}
+
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    """A rendered schema document plus its precompressed variants."""
+
+    body: bytes
+    digest: str
+    encoded: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_body(cls, body, encoded=None):
+        encoded = dict(encoded or {})
+        for encoding in available_encodings():
+            if encoding not in encoded:
+                encoded[encoding] = compress(body, encoding, max_compression=True)
+        return cls(body=body, digest=hashlib.sha256(body).hexdigest(), encoded=encoded)
+
+    def variant(self, encoding=None):
+        """Return ``(body, etag)`` for the given content coding."""
+        if encoding is None:
+            return self.body, f'"{self.digest}"'
+        # each coding is a different representation and needs its own strong ETag
+        return self.encoded[encoding], f'"{self.digest}-{encoding}"'
+
+
+def generate_schema(generator_class=None):
+    generator_class = generator_class or spectacular_settings.DEFAULT_GENERATOR_CLASS
+    generator = generator_class(urlconf=spectacular_settings.SERVE_URLCONF)
+    return generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+
+
+def render_schema(schema, fmt):
+    renderer = SCHEMA_RENDERERS[fmt]()
+    return renderer.render(schema, renderer.media_type, renderer_context={})
+
+
+def artifact_path(directory, fmt, encoding=None):
+    return Path(directory) / f"schema.{fmt}{ENCODING_SUFFIXES.get(encoding, '')}"
+
+
+def write_schema_artifacts(directory):
+    """Generate the schema once and write every format and encoding to ``directory``."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    schema = generate_schema()
+    written = []
+    for fmt in SCHEMA_RENDERERS:
+        artifact = SchemaArtifact.from_body(render_schema(schema, fmt))
+        path = artifact_path(directory, fmt)
+        path.write_bytes(artifact.body)
+        written.append(path)
+        for encoding, body in artifact.encoded.items():
+            path = artifact_path(directory, fmt, encoding)
+            path.write_bytes(body)
+            written.append(path)
+    return written
+
+
+def _read_artifact(fmt):
+    directory = getattr(settings, "SCHEMA_ARTIFACT_DIR", None)
+    if not directory:
+        return None
+    path = artifact_path(directory, fmt)
+    if not path.is_file():
+        return None
+    encoded = {}
+    for encoding in available_encodings():
+        encoded_path = artifact_path(directory, fmt, encoding)
+        if encoded_path.is_file():
+            encoded[encoding] = encoded_path.read_bytes()
+    return SchemaArtifact.from_body(path.read_bytes(), encoded)
+
+
+def get_schema_artifact(fmt):
+    """
+    Return the schema artifact for ``fmt``, building it at most once per process.
+
+    Artifacts written by ``manage.py build_schema`` are preferred; otherwise the
+    schema is generated on first use and kept in memory.
+    """
+    artifact = _artifacts.get(fmt)
+    if artifact is None:
+        with _artifacts_lock:
+            artifact = _artifacts.get(fmt)
+            if artifact is None:
+                artifact = _read_artifact(fmt) or SchemaArtifact.from_body(render_schema(generate_schema(), fmt))
+                _artifacts[fmt] = artifact
+    return artifact
+
+
+def clear_schema_cache():
+    with _artifacts_lock:
+        _artifacts.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """
+    Serves the OpenAPI schema from a precomputed artifact instead of
+    introspecting every view on each request.
+    """
+
+    def _uses_default_configuration(self):
+        # the cache holds the schema for the default settings only
+        return (
+            self.urlconf == spectacular_settings.SERVE_URLCONF
+            and self.generator_class is spectacular_settings.DEFAULT_GENERATOR_CLASS
+            and self.serve_public == spectacular_settings.SERVE_PUBLIC
+            and self.api_version is None
+            and not self.custom_settings
+            and self.patterns is None
+        )
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        # translated or versioned schemas depend on the request, customised views
+        # describe a different schema, and media type parameters such as
+        # "indent=2" change the rendering, so generate those live
+        if (
+            not self._uses_default_configuration()
+            or parse_header_parameters(request.accepted_media_type)[1]
+            or request.GET.get("lang")
+            or request.version
+            or request.GET.get("version")
+        ):
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        artifact = get_schema_artifact(renderer.format)
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING"), tuple(artifact.encoded))
+        body, etag = artifact.variant(encoding)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = HttpResponse(body, content_type=content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, None)}"'
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, no-cache"
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return get_conditional_response(request, etag=etag, response=response)
@@ -1,6 +1,30 @@
+import gzip
+import io
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock, skipIf
+
+import brotli
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from drf_spectacular.views import SpectacularAPIView
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from . import routers
+from .middleware import REPLICA_PIN_COOKIE, CompressionMiddleware, ReplicaRoutingMiddleware
+from .models import Patient
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .schema import CachedSpectacularAPIView, artifact_path, clear_schema_cache, generate_schema, render_schema
 
 
 class BaseAPITestCase(APITestCase):
@@ -207,4 +231,302 @@ class MappingRoutesTests(BaseAPITestCase):
         mapping_id = self.create_mapping(patient_id, doctor_id)
 
         resp = self.client.delete(f"{self.mappings_url}{mapping_id}/", format="json")
-        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class SchemaRoutesTests(APITestCase):
+    schema_url = "/api/schema/"
+
+    def setUp(self):
+        clear_schema_cache()
+        self.addCleanup(clear_schema_cache)
+
+    def test_cached_schema_matches_live_generation(self):
+        for fmt in ("yaml", "json"):
+            resp = self.client.get(self.schema_url, {"format": fmt})
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+            live = SpectacularAPIView.as_view()(RequestFactory().get(self.schema_url, {"format": fmt}))
+            live.render()
+            self.assertEqual(resp.content, live.content)
+
+        indented = "application/vnd.oai.openapi+json; indent=1"
+        resp = self.client.get(self.schema_url, HTTP_ACCEPT=indented)
+        live = SpectacularAPIView.as_view()(RequestFactory().get(self.schema_url, HTTP_ACCEPT=indented))
+        live.render()
+        self.assertEqual(resp.content, live.content)
+        self.assertIn(b'\n "openapi"', resp.content)
+
+    def test_customised_view_is_generated_live(self):
+        request = RequestFactory().get(self.schema_url, {"format": "json"})
+        resp = CachedSpectacularAPIView.as_view(urlconf=["core.urls"])(request)
+        resp.render()
+
+        live = SpectacularAPIView.as_view(urlconf=["core.urls"])(RequestFactory().get(self.schema_url, {"format": "json"}))
+        live.render()
+        self.assertEqual(resp.content, live.content)
+        self.assertNotIn(b"/api/schema/", resp.content)
+
+    def test_schema_served_precompressed(self):
+        resp = self.client.get(self.schema_url, {"format": "json"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp["Vary"])
+        self.assertEqual(gzip.decompress(resp.content), render_schema(generate_schema(), "json"))
+
+    def test_schema_etag_not_modified(self):
+        resp = self.client.get(self.schema_url)
+        etag = resp["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        resp = self.client.get(self.schema_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp["ETag"], etag)
+
+    def test_schema_served_from_build_schema_artifacts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command("build_schema", output_dir=directory, stdout=io.StringIO())
+            path = artifact_path(directory, "yaml")
+            path.write_bytes(b"openapi: 3.0.3\n")
+
+            with override_settings(SCHEMA_ARTIFACT_DIR=directory):
+                resp = self.client.get(self.schema_url, {"format": "yaml"})
+        self.assertEqual(resp.content, b"openapi: 3.0.3\n")
+
+
+class JSONRenderingTests(SimpleTestCase):
+    def test_orjson_renderer_matches_stdlib_renderer(self):
+        data = {
+            "name": "Zoë\u2028",
+            "fee": Decimal("12.50"),
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "items": [1, 2.5, None, True],
+            "big": 2**70,
+            "negative_big": -(2**63) - 1,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_orjson_renderer_non_finite_floats(self):
+        data = {"a": float("nan"), "b": [float("inf")]}
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+        with self.assertRaises(ValueError):
+            ORJSONRenderer().render(data)
+
+        lenient = type("LenientRenderer", (ORJSONRenderer,), {"strict": False})
+        self.assertEqual(lenient().render(data), b'{"a":NaN,"b":[Infinity]}')
+
+    def test_orjson_renderer_float_exponents(self):
+        # same value, orjson spells the exponent without a sign
+        self.assertEqual(ORJSONRenderer().render({"a": 1e16}), b'{"a":1e16}')
+        self.assertEqual(JSONRenderer().render({"a": 1e16}), b'{"a":1e+16}')
+
+    def test_orjson_parser(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"age": 30}')), {"age": 30})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b"{not json"))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"name": "John Doe"}' * 100
+
+    def process(self, response, accept_encoding="gzip, br"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_with_negotiated_encoding(self):
+        resp = self.process(HttpResponse(self.body), "gzip;q=0.5, br")
+        self.assertEqual(resp["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(resp.content), self.body)
+
+        resp = self.process(HttpResponse(self.body), "gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(resp.content), self.body)
+
+    def test_skips_small_and_unaccepted_responses(self):
+        resp = self.process(HttpResponse(b"{}"))
+        self.assertFalse(resp.has_header("Content-Encoding"))
+
+        resp = self.process(HttpResponse(self.body), "identity")
+        self.assertFalse(resp.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", resp["Vary"])
+
+    def test_compresses_streaming_responses(self):
+        resp = self.process(StreamingHttpResponse(iter([self.body, self.body])), "gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(resp.streaming_content)), self.body * 2)
+
+    async def test_compresses_async_streaming_responses(self):
+        async def chunks():
+            yield self.body
+            yield self.body
+
+        resp = self.process(StreamingHttpResponse(chunks()), "gzip")
+        self.assertTrue(resp.is_async)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        content = b"".join([chunk async for chunk in resp.streaming_content])
+        self.assertEqual(gzip.decompress(content), self.body * 2)
+
+
+class CompressedListRoutesTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        user = self.create_user()
+        self.login_and_authenticate()
+        Patient.objects.bulk_create(
+            Patient(name=f"Patient {i}", age=30, gender="Male", contact="+1-555-0101", created_by=user)
+            for i in range(20)
+        )
+
+    def test_list_patients_compressed(self):
+        resp = self.client.get(self.patients_url, HTTP_ACCEPT_ENCODING="br")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp["Content-Encoding"], "br")
+        self.assertEqual(len(resp.data), 20)
+
+
+@skipIf(
+    settings.DATABASES["replica_1"].get("TEST", {}).get("MIRROR"),
+    "replica_1 is a configured replica mirroring default, not a separate test database",
+)
+@override_settings(REPLICA_DATABASES=["replica_1"])
+class ReplicaRoutingTests(APITransactionTestCase):
+    """Routes real requests between the primary and a second SQLite database."""
+
+    databases = {"default", "replica_1"}
+    patients_url = "/api/patients/"
+    user_email = "tester@example.com"
+    user_password = "StrongPass123!"
+
+    def setUp(self):
+        cache.clear()
+        self.replicate()
+
+    def replicate(self):
+        # stand-in for replication: copy the primary's rows to the replica
+        User = get_user_model()
+        Patient.objects.using("replica_1").all().delete()
+        User.objects.using("replica_1").all().delete()
+        User.objects.using("replica_1").bulk_create(User.objects.using("default").all())
+        Patient.objects.using("replica_1").bulk_create(Patient.objects.using("default").all())
+
+    def login(self):
+        resp = self.client.post(
+            "/api/auth/login/",
+            {"email": self.user_email, "password": self.user_password},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+
+    def patient_names(self):
+        resp = self.client.get(self.patients_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK, resp.data)
+        return [patient["name"] for patient in resp.data]
+
+    def test_get_reads_replica_until_user_writes(self):
+        user = get_user_model().objects.create_user(
+            username=self.user_email, email=self.user_email, password=self.user_password
+        )
+        self.replicate()
+        self.login()
+        Patient.objects.using("replica_1").create(
+            name="Replica only", age=40, gender="Female", contact="+1-555-0100", created_by_id=user.pk
+        )
+        self.assertEqual(self.patient_names(), ["Replica only"])
+
+        resp = self.client.post(
+            self.patients_url,
+            {"name": "John Doe", "age": 30, "gender": "Male", "contact": "+1-555-0101"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        # pinned through the token's user, not a cookie
+        self.assertNotIn(REPLICA_PIN_COOKIE, resp.cookies)
+        self.client.cookies.clear()
+        self.assertEqual(self.patient_names(), ["John Doe"])
+
+    def test_registered_user_reads_primary(self):
+        resp = self.client.post(
+            "/api/auth/register/",
+            {"name": "Test User", "email": self.user_email, "password": self.user_password},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED, resp.data)
+        # anonymous writers also get the cookie fallback
+        self.assertTrue(resp.cookies[REPLICA_PIN_COOKIE]["secure"])
+        self.client.cookies.clear()
+
+        self.login()
+        self.assertEqual(self.patient_names(), [])
+
+        # once the pin expires, the stale replica doesn't know the user yet
+        cache.clear()
+        resp = self.client.get(self.patients_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_failed_replica_query_skips_replica(self):
+        get_user_model().objects.create_user(
+            username=self.user_email, email=self.user_email, password=self.user_password
+        )
+        self.replicate()
+        self.login()
+        self.addCleanup(routers._unavailable_until.clear)
+
+        with connections["replica_1"].schema_editor() as editor:
+            editor.delete_model(Patient)
+        self.addCleanup(self.restore_replica_patients)
+        with self.assertRaises(OperationalError):
+            self.client.get(self.patients_url)
+
+        # later reads go to the primary while the replica is skipped
+        self.assertEqual(self.patient_names(), [])
+
+    def restore_replica_patients(self):
+        with connections["replica_1"].schema_editor() as editor:
+            editor.create_model(Patient)
+
+
+@override_settings(REPLICA_DATABASES=["replica_1"])
+class ReplicaAvailabilityTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.connections = {"default": mock.Mock(in_atomic_block=False), "replica_1": mock.Mock(execute_wrappers=[])}
+        patcher = mock.patch.object(routers, "connections", self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers._unavailable_until.clear)
+
+    def read_db_for_get(self):
+        token = routers.activate(use_replica=True)
+        try:
+            return self.router.db_for_read(Patient)
+        finally:
+            routers.deactivate(token)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.connections["replica_1"].ensure_connection.side_effect = OperationalError
+        self.assertIsNone(self.read_db_for_get())
+
+        # the failed replica is skipped until the retry window passes
+        self.connections["replica_1"].ensure_connection.side_effect = None
+        self.assertIsNone(self.read_db_for_get())
+
+        routers._unavailable_until["replica_1"] = 0
+        self.assertEqual(self.read_db_for_get(), "replica_1")
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_middleware_inactive_without_replicas(self):
+        request = RequestFactory().get("/api/patients/", HTTP_AUTHORIZATION="Bearer token")
+        with mock.patch("core.middleware._token_user_id") as token_user_id, mock.patch.object(
+            routers, "activate"
+        ) as activate:
+            resp = ReplicaRoutingMiddleware(lambda request: HttpResponse())(request)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        token_user_id.assert_not_called()
+        activate.assert_not_called()
+
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate("replica_1", "core"))
+        self.assertTrue(self.router.allow_migrate("default", "core"))
@@ -4,6 +4,11 @@ set -e
 # Run database migrations
 python manage.py migrate --noinput
 
+# Precompute the OpenAPI schema served by /api/schema/
+if [ -n "$SCHEMA_ARTIFACT_DIR" ]; then
+  python manage.py build_schema
+fi
+
 # Collect static files (optional)
 # python manage.py collectstatic --noinput
 